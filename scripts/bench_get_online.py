@@ -0,0 +1,112 @@
+"""
+Замер стоимости форматирования ответа на запрос sys_online в пересчете на одно устройство.
+
+Сравнивается прежняя обработка (разбор ответа в FluxTable/FluxRecord и цикл с
+timedelta(hours=3) и strftime) и текущая (csv без аннотаций и format_online).
+Стоимость самого форматирования до и после почти одинакова: весь выигрыш дает
+отказ от разбора ответа в FluxTable/FluxRecord, а не ускорение форматирования.
+Запуск из корня репозитория: python scripts/bench_get_online.py [количество устройств]
+"""
+import csv
+import io
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from influxdb_client.client.flux_csv_parser import FluxCsvParser, FluxSerializationMode
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from src.mqtt_tbot.db_query import format_online, get_timezone  # noqa: E402 pylint: disable = wrong-import-position
+
+REPEAT = 5
+
+
+def make_times(count: int) -> list:
+    """Время последнего сообщения для каждого устройства в формате RFC3339"""
+
+    start = datetime(2021, 7, 1, tzinfo=timezone.utc)
+    return [(start + timedelta(seconds=i, microseconds=i)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            for i in range(count)]
+
+
+def make_annotated_csv(times: list) -> bytes:
+    """Ответ сервера в формате по умолчанию (с аннотациями), по таблице на устройство"""
+
+    lines = []
+    for i, last_time in enumerate(times):
+        lines += ["#datatype,string,long,dateTime:RFC3339,string",
+                  "#group,false,false,false,true",
+                  "#default,_result,,,",
+                  ",result,table,_time,_value",
+                  f",,{i},{last_time},dev_{i}",
+                  ""]
+    return "".join(f"{line}\r\n" for line in lines).encode()
+
+
+def make_plain_csv(times: list) -> list:
+    """Ответ сервера в формате csv без аннотаций"""
+
+    lines = [",result,table,_time,_value"]
+    lines += [f",_result,{i},{last_time},dev_{i}" for i, last_time in enumerate(times)]
+    return [f"{line}\r\n" for line in lines]
+
+
+def old_format(tables: list) -> list:
+    """Прежний цикл форматирования из get_online"""
+
+    devices = []
+    for table in tables:
+        for record in table.records:
+            timestamp = record.get_time() + timedelta(hours=3)
+            last_time = timestamp.strftime("%d.%m.%Y %H:%M:%S")
+            device_name = record.values.get("_value")
+            devices.append(f"device: {device_name}, last time: {last_time}")
+    return devices
+
+
+def parse_annotated(response: bytes) -> list:
+    """Разбор ответа в FluxTable, как это делает query_api().query()"""
+
+    parser = FluxCsvParser(response=io.BytesIO(response),
+                           serialization_mode=FluxSerializationMode.tables)
+    list(parser.generator())
+    return parser.tables
+
+
+def measure(func) -> float:
+    """Лучшее время одного вызова func в секундах"""
+
+    return min(timeit.repeat(func, number=1, repeat=REPEAT))
+
+
+def main():
+    """Выводит стоимость обработки одного устройства в микросекундах"""
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    # Прежний цикл добавлял 3 часа, что совпадает с Europe/Moscow.
+    db_timezone = get_timezone("Europe/Moscow")
+    times = make_times(count)
+    annotated_csv = make_annotated_csv(times)
+    plain_csv = make_plain_csv(times)
+
+    tables = parse_annotated(annotated_csv)
+    rows = list(csv.reader(plain_csv))
+
+    assert old_format(tables) == format_online(rows, db_timezone), "результаты отличаются"
+
+    results = [
+        ("форматирование, до", measure(lambda: old_format(tables))),
+        ("форматирование, после", measure(lambda: format_online(rows, db_timezone))),
+        ("разбор и форматирование, до",
+         measure(lambda: old_format(parse_annotated(annotated_csv)))),
+        ("разбор и форматирование, после",
+         measure(lambda: format_online(csv.reader(plain_csv), db_timezone)))]
+
+    print(f"устройств: {count}, часовой пояс: {db_timezone}")
+    for name, seconds in results:
+        print(f"{name:<32} {seconds / count * 1e6:8.2f} мкс/устройство")
+
+
+if __name__ == "__main__":
+    main()
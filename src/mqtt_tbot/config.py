@@ -30,6 +30,7 @@ class Settings(BaseSettings):  # pylint: disable = too-few-public-methods
     db_url - адрес базы данных
     db_token - токен или логин/пароль для доступа к базе
     db_org - организация, которой принадлежит база данных.
+    db_timezone - часовой пояс, в котором пользователю выводится время из базы данных.
     """
 
     # mqtt_publisher
@@ -46,6 +47,7 @@ class Settings(BaseSettings):  # pylint: disable = too-few-public-methods
     db_url: str = ""
     db_token: str = ""
     db_org: str = ""
+    db_timezone: str = "Europe/Moscow"
 
 
 def is_main_settings_correct(_settings: Settings) -> bool:
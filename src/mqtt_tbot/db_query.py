@@ -1,6 +1,8 @@
 """Модуль для взаимодействия с базой данных"""
-from datetime import timedelta
-from influxdb_client import InfluxDBClient, rest
+from datetime import datetime, timezone, tzinfo
+from typing import Iterable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from influxdb_client import Dialect, InfluxDBClient, rest
 from urllib3.exceptions import NewConnectionError, LocationParseError
 from .config import settings  # pylint: disable = import-error
 from .event_logger import get_info_logger, get_error_logger  # pylint: disable = import-error
@@ -8,6 +10,29 @@ from .event_logger import get_info_logger, get_error_logger  # pylint: disable =
 event_log = get_info_logger("INFO_db_query")
 error_log = get_error_logger("ERR_db_query")
 
+TIME_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+# Ответ запрашивается в виде csv без аннотаций: только заголовок и значения.
+CSV_DIALECT = Dialect(header=True, delimiter=",", annotations=[], date_time_format="RFC3339")
+
+# Текст запроса не меняется от вызова к вызову, имя базы передается параметром bucket_name.
+ONLINE_QUERY = 'from(bucket: bucket_name)\
+    |> range(start: -24h)\
+    |> filter(fn: (r) => r._measurement == "sys_online")\
+    |> group(columns: ["_value"], mode: "by")\
+    |> last()\
+    |> keep(columns: ["_time", "_value"])'
+
+
+def get_timezone(name: str) -> tzinfo:
+    """Возвращает часовой пояс по названию. Если название некорректно, то возвращается UTC."""
+
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        error_log.error("Неизвестный часовой пояс %s", name)
+        return timezone.utc
+
 
 def connect_db() -> InfluxDBClient:
     """Подключение к базе данных"""
@@ -18,18 +43,27 @@ def connect_db() -> InfluxDBClient:
     return client
 
 
-def get_response_from_db(db_client: InfluxDBClient, query: str) -> list:
+def get_response_from_db(db_client: InfluxDBClient, query: str,
+                         params: Optional[dict] = None) -> List[List[str]]:
     """
-    Возвращает результат запроса в виде списка. Если в ходе получения запроса произошла ошибка,
-    то возвращается пустой список.
+    Возвращает результат запроса в виде списка строк csv. Если в ходе получения запроса
+    произошла ошибка, то возвращается пустой список.
+    params - параметры запроса, доступные в тексте запроса по имени. Они передаются серверу
+    отдельно от текста запроса (option в блоке extern).
     """
 
     try:
-        answer = db_client.query_api().query(org=settings.db_org,
-                                             query=query)
-        return answer
+        answer = db_client.query_api().query_csv(org=settings.db_org,
+                                                 query=query,
+                                                 dialect=CSV_DIALECT,
+                                                 params=params)
+        return list(answer)
+
+    except rest.ApiException as err:
+        error_log.error("Ошибка выполнения запроса к базе данных: %s %s", err.status, err.reason)
+        return []
 
-    except (rest.ApiException, NewConnectionError, LocationParseError, IndexError):
+    except (NewConnectionError, LocationParseError, IndexError):
         return []
 
 
@@ -45,25 +79,44 @@ def get_online(db_name: str) -> list:
 
     db_client = connect_db()
 
-    query = f'from(bucket:"{db_name}")\
-    |> range(start: -24h)\
-    |> filter(fn: (r) => r._measurement == "sys_online")\
-    |> group(columns: ["_value"], mode: "by")\
-    |> last()'
-
-    devices: list = []
-
     try:
-        answer = get_response_from_db(db_client, query)
+        answer = get_response_from_db(db_client, ONLINE_QUERY, params={"bucket_name": db_name})
     except Exception as err:  # pylint: disable = broad-except
         event_log.info(str(err))
-        return devices
-
-    for table in answer:
-        for record in table.records:
-            timestamp = record.get_time() + timedelta(hours=3)
-            last_time = timestamp.strftime("%d.%m.%Y %H:%M:%S")
-            device_name = record.values.get("_value")
-            devices.append(f"device: {device_name}, last time: {last_time}")
+        return []
+
+    return format_online(answer, get_timezone(settings.db_timezone))
+
+
+def format_online(rows: Iterable[List[str]], time_zone: tzinfo) -> list:
+    """
+    Форматирует ответ на запрос sys_online (строки csv) в строки вида
+    "device: <имя>, last time: <время в часовом поясе time_zone>".
+    Каждая таблица в ответе начинается с заголовка, таблицы разделены пустой строкой.
+    Таблицы без колонок _time и _value (например, сообщение об ошибке) пропускаются.
+
+    Само форматирование стоит столько же, сколько прежний цикл по FluxRecord
+    (strftime и перевод в часовой пояс для каждой строки). Выигрыш дает только отказ
+    от разбора ответа в FluxTable/FluxRecord, см. scripts/bench_get_online.py.
+    """
+
+    devices = []
+    time_index: Optional[int] = None
+    value_index: Optional[int] = None
+    is_header = True
+
+    for row in rows:
+        if not row:
+            is_header = True
+        elif is_header:
+            is_header = False
+            has_columns = "_time" in row and "_value" in row
+            time_index = row.index("_time") if has_columns else None
+            value_index = row.index("_value") if has_columns else None
+        elif time_index is not None and value_index is not None:
+            # RFC3339 в UTC: секунд достаточно, дробная часть и "Z" отбрасываются.
+            timestamp = datetime.fromisoformat(row[time_index][:19]).replace(tzinfo=timezone.utc)
+            last_time = timestamp.astimezone(time_zone).strftime(TIME_FORMAT)
+            devices.append(f"device: {row[value_index]}, last time: {last_time}")
 
     return devices
@@ -0,0 +1,65 @@
+"""Тестируется файл db_query.py"""
+
+from datetime import timezone
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
+from influxdb_client import rest
+from src.mqtt_tbot.db_query import (CSV_DIALECT, ONLINE_QUERY, format_online, get_online,
+                                    get_response_from_db, get_timezone)
+
+online_rows = [
+    ["", "result", "table", "_time", "_value"],
+    ["", "_result", "0", "2021-07-01T21:30:00.123456789Z", "dev_1"],
+    ["", "_result", "1", "2021-07-02T08:00:05Z", "dev_2"],
+    [],
+    ["", "error", "reference"],
+    ["", "some error", ""]]
+
+online_devices = ["device: dev_1, last time: 02.07.2021 00:30:00",
+                  "device: dev_2, last time: 02.07.2021 11:00:05"]
+
+
+def test_format_online():
+    """Время последнего сообщения должно выводиться в заданном часовом поясе"""
+
+    assert format_online(online_rows, ZoneInfo("Europe/Moscow")) == online_devices
+
+
+def test_format_online_empty():
+    """Для пустого ответа должен возвращаться пустой список"""
+
+    assert not format_online([], timezone.utc)
+
+
+def test_get_timezone_unknown():
+    """Для неизвестного часового пояса должен использоваться UTC"""
+
+    assert get_timezone("Unknown/Zone") is timezone.utc
+
+
+def test_get_online():
+    """Имя базы передается параметром запроса, ответ в виде csv форматируется в список устройств"""
+
+    db_client = MagicMock()
+    query_csv = db_client.query_api.return_value.query_csv
+    query_csv.return_value = iter(online_rows)
+
+    with patch("src.mqtt_tbot.db_query.connect_db", return_value=db_client), \
+            patch("src.mqtt_tbot.db_query.settings.db_timezone", "Europe/Moscow"):
+        assert get_online("user") == online_devices
+
+    query_csv.assert_called_once()
+    assert query_csv.call_args.kwargs["query"] == ONLINE_QUERY
+    assert query_csv.call_args.kwargs["params"] == {"bucket_name": "user"}
+    assert query_csv.call_args.kwargs["dialect"] is CSV_DIALECT
+
+
+def test_get_response_from_db_api_error():
+    """При ошибке сервера запрос не повторяется и возвращается пустой список"""
+
+    db_client = MagicMock()
+    query_csv = db_client.query_api.return_value.query_csv
+    query_csv.side_effect = rest.ApiException(status=404, reason="Not Found")
+
+    assert not get_response_from_db(db_client, ONLINE_QUERY, params={"bucket_name": "user"})
+    query_csv.assert_called_once()